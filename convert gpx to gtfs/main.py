@@ -1,9 +1,7 @@
 import gpxpy
 import sys
-from shapely.geometry import LineString
-import geopy.distance
+import numpy as np
 import csv
-from datetime import timedelta
 
 if len(sys.argv) < 2:
     print("Usage: python3 main.py input.gpx")
@@ -31,31 +29,48 @@ for track in gpx.tracks:
         for point in segment.points:
             points.append((point.longitude, point.latitude))
 
-line = LineString(points)
+EARTH_RADIUS_M = 6371008.8  # mean Earth radius
+
+def haversine_distances(coords):
+    lon, lat = np.radians(np.asarray(coords, dtype=np.float64)).T
+    dlat = lat[1:] - lat[:-1]
+    dlon = lon[1:] - lon[:-1]
+    clat = np.cos(lat)
+    a = np.sin(dlat*0.5)**2 + clat[:-1]*clat[1:]*np.sin(dlon*0.5)**2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
 
 def geodesic_length(coords):
-    total = 0
-    for i in range(len(coords)-1):
-        total += geopy.distance.geodesic(coords[i][::-1], coords[i+1][::-1]).meters
-    return total
+    return haversine_distances(coords).sum()
 
 total_meters = geodesic_length(points)
-num_stops = int(total_meters // stop_dist)
+num_stops = max(int(total_meters // stop_dist), 1)
+
+xs, ys = np.asarray(points, dtype=np.float64).T
+seg = np.hypot(np.diff(xs), np.diff(ys))
+cum = np.concatenate(([0], np.cumsum(seg)))
 
-interpolated = []
-dist_step = line.length / num_stops
-for i in range(num_stops + 1):
-    point = line.interpolate(dist_step * i)
-    interpolated.append((point.x, point.y))
+dist_step = cum[-1] / num_stops  # planar length, same metric as the offsets
+targets = np.arange(num_stops + 1) * dist_step
+idx = np.clip(np.searchsorted(cum, targets, side='right') - 1, 0, len(seg) - 1)
+t = np.clip((targets - cum[idx]) / np.where(seg[idx] > 0, seg[idx], 1), 0, 1)
+interpolated = list(zip((xs[idx] + t * (xs[idx+1] - xs[idx])).tolist(),
+                        (ys[idx] + t * (ys[idx+1] - ys[idx])).tolist()))
 
 speed_mps = (speed_kmh * 1000) / 3600
-times = [0]
-for i in range(1, len(interpolated)):
-    dist = geopy.distance.geodesic(interpolated[i-1][::-1], interpolated[i][::-1]).meters
-    times.append(times[-1] + dist / speed_mps)
+# Stops are evenly spaced in planar degrees along the track, so each hop covers roughly
+# total_meters / num_stops (the metre length varies slightly with heading)
+step_meters = total_meters / num_stops
+times = np.arange(len(interpolated)) * (step_meters / speed_mps)
+
+def seconds_to_gtfs_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 # --- Write GTFS Files ---
 
+CSV_BUFFER_SIZE = 1 << 20  # 1 MiB
+
 # agency.txt
 with open('agency.txt', 'w', newline='') as f:
     writer = csv.writer(f)
@@ -63,11 +78,10 @@ with open('agency.txt', 'w', newline='') as f:
     writer.writerow([1, agency_name, agency_url, agency_timezone])
 
 # stops.txt
-with open('stops.txt', 'w', newline='') as f:
+with open('stops.txt', 'w', newline='', buffering=CSV_BUFFER_SIZE) as f:
     writer = csv.writer(f)
     writer.writerow(['stop_id', 'stop_name', 'stop_lat', 'stop_lon'])
-    for idx, coord in enumerate(interpolated, start=1):
-        writer.writerow([idx, f'Stop {idx}', coord[1], coord[0]])
+    writer.writerows([idx, f'Stop {idx}', coord[1], coord[0]] for idx, coord in enumerate(interpolated, start=1))
 
 # routes.txt
 with open('routes.txt', 'w', newline='') as f:
@@ -82,12 +96,11 @@ with open('trips.txt', 'w', newline='') as f:
     writer.writerow([1, 1, 1, 1])
 
 # stop_times.txt
-with open('stop_times.txt', 'w', newline='') as f:
+with open('stop_times.txt', 'w', newline='', buffering=CSV_BUFFER_SIZE) as f:
     writer = csv.writer(f)
     writer.writerow(['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'])
-    for idx, seconds in enumerate(times, start=1):
-        hhmmss = str(timedelta(seconds=int(seconds)))
-        writer.writerow([1, hhmmss, hhmmss, idx, idx])
+    hhmmss = [seconds_to_gtfs_time(seconds) for seconds in times]
+    writer.writerows([1, t, t, idx, idx] for idx, t in enumerate(hhmmss, start=1))
 
 # calendar.txt
 with open('calendar.txt', 'w', newline='') as f:
@@ -96,11 +109,10 @@ with open('calendar.txt', 'w', newline='') as f:
     writer.writerow([1, 1, 1, 1, 1, 1, 0, 0, '20250720', '20251231'])
 
 # shapes.txt
-with open('shapes.txt', 'w', newline='') as f:
+with open('shapes.txt', 'w', newline='', buffering=CSV_BUFFER_SIZE) as f:
     writer = csv.writer(f)
     writer.writerow(['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence'])
-    for idx, coord in enumerate(points, start=1):
-        writer.writerow([1, coord[1], coord[0], idx])
+    writer.writerows([1, coord[1], coord[0], idx] for idx, coord in enumerate(points, start=1))
 
 print("\nGenerated GTFS files:")
 print("agency.txt, stops.txt, routes.txt, trips.txt, stop_times.txt, calendar.txt, shapes.txt")